@@ -112,7 +112,7 @@ def get_hr_scheduler_from_infotext(d: dict):
 @functools.cache
 def get_sampler_and_scheduler(sampler_name, scheduler_name, *, convert_automatic=True):
     default_sampler = samplers[0]
-    found_scheduler = sd_schedulers.schedulers_map.get(scheduler_name, sd_schedulers.schedulers[0])
+    found_scheduler = sd_schedulers.find_scheduler(scheduler_name) or sd_schedulers.schedulers[0]
 
     name = sampler_name or default_sampler.name
 
@@ -90,7 +90,7 @@ class KDiffusionSampler(sd_samplers_common.Sampler):
         if scheduler_name == 'Automatic':
             scheduler_name = self.config.options.get('scheduler', None)
 
-        scheduler = sd_schedulers.schedulers_map.get(scheduler_name)
+        scheduler = sd_schedulers.find_scheduler(scheduler_name)
 
         m_sigma_min, m_sigma_max = self.model_wrap.sigmas[0].item(), self.model_wrap.sigmas[-1].item()
         sigma_min, sigma_max = (0.1, 10) if opts.use_old_karras_scheduler_sigmas else (m_sigma_min, m_sigma_max)